@@ -1,8 +1,8 @@
 # Adrienne Dominique Sy Chu
 
+import numpy as np
 from pgmpy.models import DiscreteBayesianNetwork
-from pgmpy.inference import VariableElimination
-from pgmpy.factors.discrete import TabularCPD
+from pgmpy.factors.discrete import TabularCPD, DiscreteFactor
 
 car_model = DiscreteBayesianNetwork(
     [
@@ -65,36 +65,80 @@ cpd_moves = TabularCPD(
 # Associating the parameters with the model structure
 car_model.add_cpds( cpd_starts, cpd_ignition, cpd_gas, cpd_radio, cpd_battery, cpd_moves)
 
-car_infer = VariableElimination(car_model)
-
-print(car_infer.query(variables=["Moves"],evidence={"Radio":"turns on", "Starts":"yes"}))
+# Multiply all CPDs of a (small) model into one joint probability table.
+# Returns dict with the variable order, their state names, and the table.
+def build_joint(model):
+    variables = list(model.nodes())
+    cards = [model.get_cardinality(var) for var in variables]
+    state_names = {}
+    values = np.ones(cards)
+    for cpd in model.get_cpds():
+        axes = [variables.index(var) for var in cpd.variables]
+        # Reorder the CPD's axes to the joint's variable order and
+        # broadcast it over the variables it doesn't mention
+        order = np.argsort(axes)
+        shape = [1] * len(variables)
+        for axis in axes:
+            shape[axis] = cards[axis]
+        values = values * cpd.values.transpose(order).reshape(shape)
+        state_names[cpd.variable] = cpd.state_names[cpd.variable]
+    return {
+        'variables': variables,
+        'state_names': state_names,
+        'values': values,
+    }
+
+# P(variable | evidence) by slicing and summing the joint table.
+def query(joint, variable, evidence):
+    variables = joint['variables']
+    state_names = joint['state_names']
+
+    # Fix evidence variables to their observed state
+    index = [slice(None)] * len(variables)
+    for var, state in evidence.items():
+        index[variables.index(var)] = state_names[var].index(state)
+    table = joint['values'][tuple(index)]
+
+    # Sum out everything except the query variable, then normalize
+    remaining = [var for var in variables if var not in evidence]
+    keep = remaining.index(variable)
+    other_axes = tuple(i for i in range(len(remaining)) if i != keep)
+    values = table.sum(axis=other_axes)
+    values = values / values.sum()
+
+    return DiscreteFactor([variable], [len(values)], values,
+                          state_names={variable: state_names[variable]})
+
+car_joint = build_joint(car_model)
+
+print(query(car_joint, "Moves", {"Radio": "turns on", "Starts": "yes"}))
 
 
 def main():
     print("\n--- Car Network Queries ---")
 
     # Q1
-    q1 = car_infer.query(variables=["Battery"], evidence={"Moves": "no"})
+    q1 = query(car_joint, "Battery", {"Moves": "no"})
     print("\nQ1. P(Battery | Moves=no):\n", q1)
 
     # Q2
-    q2 = car_infer.query(variables=["Starts"], evidence={"Radio": "Doesn't turn on"})
+    q2 = query(car_joint, "Starts", {"Radio": "Doesn't turn on"})
     print("\nQ2. P(Starts | Radio=Doesn't turn on):\n", q2)
 
     # Q3
-    q3a = car_infer.query(variables=["Radio"], evidence={"Battery": "Works"})
-    q3b = car_infer.query(variables=["Radio"], evidence={"Battery": "Works", "Gas": "Full"})
+    q3a = query(car_joint, "Radio", {"Battery": "Works"})
+    q3b = query(car_joint, "Radio", {"Battery": "Works", "Gas": "Full"})
     print("\nQ3a. P(Radio | Battery=Works):\n", q3a)
     print("\nQ3b. P(Radio | Battery=Works, Gas=Full):\n", q3b)
 
     # Q4
-    q4a = car_infer.query(variables=["Ignition"], evidence={"Moves": "no"})
-    q4b = car_infer.query(variables=["Ignition"], evidence={"Moves": "no", "Gas": "Empty"})
+    q4a = query(car_joint, "Ignition", {"Moves": "no"})
+    q4b = query(car_joint, "Ignition", {"Moves": "no", "Gas": "Empty"})
     print("\nQ4a. P(Ignition | Moves=no):\n", q4a)
     print("\nQ4b. P(Ignition | Moves=no, Gas=Empty):\n", q4b)
 
     # Q5
-    q5 = car_infer.query(variables=["Starts"], evidence={"Radio": "turns on", "Gas": "Full"})
+    q5 = query(car_joint, "Starts", {"Radio": "turns on", "Gas": "Full"})
     print("\nQ5. P(Starts | Radio=turns on, Gas=Full):\n", q5)
 
     # Q6 (with KeyPresent)
@@ -119,8 +163,8 @@ def main():
     )
 
     car_model.add_cpds(cpd_key, cpd_starts_new)
-    car_infer2 = VariableElimination(car_model)
-    q6 = car_infer2.query(variables=["KeyPresent"], evidence={"Moves": "no"})
+    car_joint2 = build_joint(car_model)
+    q6 = query(car_joint2, "KeyPresent", {"Moves": "no"})
     print("\nQ6. P(KeyPresent | Moves=no):\n", q6)
 
 if __name__ == "__main__":
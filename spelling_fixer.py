@@ -1,183 +1,322 @@
 # Adrienne Dominique Sy Chu
 # Description: Hidden Markov Model spell fixer using Viterbi.
 
-import math
+import functools
+import mmap
 import os
-from collections import defaultdict, Counter
+
+import numpy as np
+
+# Numba is optional: without it the Viterbi kernel runs as plain NumPy
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # Use this instead of -infinity to avoid math errors
 LOG_ZERO = -1e9
 
-# Return log(x), handling zeros safely.
+# Hidden states / observed symbols
+ALPHABET = "abcdefghijklmnopqrstuvwxyz'"
+
+# bytes.translate tables: map each ALPHABET byte to its index and delete
+# every other byte, so filtering and indexing is a single C-level call
+_INDEX_TABLE = bytes.maketrans(ALPHABET.encode('ascii'), bytes(range(len(ALPHABET))))
+_NON_ALPHABET = bytes(b for b in range(256) if chr(b) not in ALPHABET)
+
+# The HMM used by viterbi(); set by load_hmm()
+HMM = None
+
+# Viterbi tables reused across words, grown by doubling when a longer
+# word comes in. Shared module state, so viterbi() is not thread-safe.
+MAX_WORD_LEN = 64
+_M_buf = np.full((MAX_WORD_LEN, len(ALPHABET)), LOG_ZERO)
+_BP_buf = np.zeros((MAX_WORD_LEN, len(ALPHABET)), dtype=np.int8)
+_path_buf = np.zeros(MAX_WORD_LEN, dtype=np.int8)
+
+# Return log(x), handling zeros safely. Works elementwise on arrays.
 def safe_log(x):
-    if x <= 0:
-        return LOG_ZERO
-    return math.log(x)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(x > 0, np.log(x), LOG_ZERO)[()]
+
+# Alphabet indices of the letters in a bytes word; other bytes are dropped.
+def _letter_indices(word):
+    return np.frombuffer(word.translate(_INDEX_TABLE, _NON_ALPHABET), dtype=np.int8)
+
+# Yield the lines of a file as raw bytes, read through a memory map.
+def _mmap_lines(filename):
+    with open(filename, 'rb') as f:
+        # Empty files can't be mapped (and have no lines anyway)
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter(mm.readline, b'')
 
 # Read aspell.txt and calculate emission and transition probabilities.
 # Returns dict with emission (E), transition (T), and start probabilities.
 def build_hmm_from_aspell(filename):
-    alphabet = list("abcdefghijklmnopqrstuvwxyz'")
+    alphabet = list(ALPHABET)
+    V = len(alphabet)
     
-    # Counters for building probabilities
-    emission_counts = defaultdict(Counter)  # emission_counts[correct][typed]
-    transition_counts = defaultdict(Counter)  # transition_counts[curr][next]
-    start_counts = Counter()  # start_counts[letter]
+    # Counts for building probabilities, indexed by alphabet position
+    emission_counts = np.zeros((V, V), dtype=np.int32)  # [correct][typed]
+    transition_counts = np.zeros((V, V), dtype=np.int32)  # [curr][next]
+    start_counts = np.zeros(V, dtype=np.int32)  # [letter]
+    known_words = set()  # correct words seen in training
     
     # Check if file exists
     if not os.path.exists(filename):
         print(f"Error: '{filename}' not found!")
         return None
     
-    with open(filename, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip().lower()
-            if not line or ':' not in line:
-                continue
-            
-            # Split: "correct: typo1 typo2 typo3"
-            parts = line.split(':', 1)
-            correct_word = parts[0].strip()
-            typos = parts[1].strip().split()
-            
-            # Filter correct word to alphabet only
-            correct_letters = [c for c in correct_word if c in alphabet]
-            if len(correct_letters) == 0:
-                continue
-            
-            # Learn emissions from SAME-LENGTH typos only
-            # (This is the key limitation of character-level HMM)
-            for typo in typos:
-                typo_letters = [c for c in typo if c in alphabet]
-                
-                # Only align if same length
-                if len(correct_letters) == len(typo_letters):
-                    for i in range(len(correct_letters)):
-                        correct_char = correct_letters[i]
-                        typed_char = typo_letters[i]
-                        # Count: when correct letter is X, typed letter is Y
-                        emission_counts[correct_char][typed_char] += 1
-            
-            # Learn transitions from correct word only
-            start_counts[correct_letters[0]] += 1
-            for i in range(len(correct_letters) - 1):
-                curr = correct_letters[i]
-                next_char = correct_letters[i + 1]
-                transition_counts[curr][next_char] += 1
-    
+    # Parse raw bytes; only ASCII letters are kept so no decoding is needed
+    for line in _mmap_lines(filename):
+        line = line.strip().lower()
+        if not line or b':' not in line:
+            continue
+        
+        # Split: "correct: typo1 typo2 typo3"
+        parts = line.split(b':', 1)
+        correct_word = parts[0].strip()
+        typos = parts[1].strip().split()
+        
+        # Filter correct word to alphabet only
+        correct_idx = _letter_indices(correct_word)
+        if len(correct_idx) == 0:
+            continue
+        known_words.add(''.join([alphabet[i] for i in correct_idx.tolist()]))
+        
+        # Learn emissions from SAME-LENGTH typos only
+        # (This is the key limitation of character-level HMM)
+        typo_idx = [idx for idx in map(_letter_indices, typos)
+                    if len(idx) == len(correct_idx)]
+        if typo_idx:
+            # Count: when correct letter is X, typed letter is Y
+            # (all same-length typos of this word in one update)
+            np.add.at(emission_counts,
+                      (np.tile(correct_idx, len(typo_idx)), np.concatenate(typo_idx)), 1)
+        
+        # Learn transitions from correct word only
+        start_counts[correct_idx[0]] += 1
+        np.add.at(transition_counts, (correct_idx[:-1], correct_idx[1:]), 1)
+
     # Convert counts to probabilities with smoothing
-    V = len(alphabet)
     smoothing = 0.01
     
     # Emission probabilities: P(typed | correct)
-    E = {}
-    for correct in alphabet:
-        E[correct] = {}
-        # Add smoothing to avoid zero probabilities
-        total = sum(emission_counts[correct].values()) + V * smoothing
-        for typed in alphabet:
-            count = emission_counts[correct][typed]
-            # Boost diagonal, but not too much!
-            # We want transitions to be able to override when needed
-            if correct == typed:
-                count += 5  # moderate boost for correct typing
-            E[correct][typed] = (count + smoothing) / total
+    # Add smoothing to avoid zero probabilities
+    total = emission_counts.sum(axis=1, keepdims=True) + V * smoothing
+    # Boost diagonal, but not too much!
+    # We want transitions to be able to override when needed
+    boosted = emission_counts + 5 * np.eye(V, dtype=np.int32)  # moderate boost
+    E_arr = (boosted + smoothing) / total
     
     # Transition probabilities: P(next | current)
-    T = {}
-    for curr in alphabet:
-        T[curr] = {}
-        total = sum(transition_counts[curr].values()) + V * smoothing
-        for next_char in alphabet:
-            count = transition_counts[curr][next_char]
-            T[curr][next_char] = (count + smoothing) / total
+    total = transition_counts.sum(axis=1, keepdims=True) + V * smoothing
+    T_arr = (transition_counts + smoothing) / total
     
     # Start probabilities: P(first letter)
-    start_prob = {}
-    total_start = sum(start_counts.values()) + V * smoothing
-    for letter in alphabet:
-        count = start_counts[letter]
-        start_prob[letter] = (count + smoothing) / total_start
+    start_arr = (start_counts + smoothing) / (start_counts.sum() + V * smoothing)
+    
+    # Dict views by letter, e.g. E['i']['e'] = P(typed='e' | correct='i')
+    E = {a: dict(zip(alphabet, E_arr[i].tolist())) for i, a in enumerate(alphabet)}
+    T = {a: dict(zip(alphabet, T_arr[i].tolist())) for i, a in enumerate(alphabet)}
+    start_prob = dict(zip(alphabet, start_arr.tolist()))
+    
+    # Precompute log tables once so Viterbi never calls log itself.
+    # logE[state][typed], logT[prev][next], logStart[state]
+    char_to_idx = {c: i for i, c in enumerate(alphabet)}
+    logE = safe_log(E_arr)
+    logT = safe_log(T_arr)
+    logStart = safe_log(start_arr)
+    
+    # Sparse successors: letters never seen after prev all share the
+    # smoothed floor logT value, so only the others are listed explicitly.
+    # succ_idx/succ_val[succ_ptr[p]:succ_ptr[p+1]] are the successors of p.
+    floor = logT.min(axis=1)
+    explicit = logT > floor[:, None]
+    succ_ptr = np.zeros(V + 1, dtype=np.int64)
+    succ_ptr[1:] = np.cumsum(explicit.sum(axis=1))
+    succ_idx = np.nonzero(explicit)[1].astype(np.int8)
+    succ_val = logT[explicit]
     
     return {
         'alphabet': alphabet,
         'E': E,
         'T': T,
         'start': start_prob,
+        'char_to_idx': char_to_idx,
+        'logE': logE,
+        'logT': logT,
+        'logStart': logStart,
+        'succ_ptr': succ_ptr,
+        'succ_idx': succ_idx,
+        'succ_val': succ_val,
+        'floor': floor,
+        # Previous states scoring more than this below the best one can't
+        # win any state (it is the widest spread of a logT column), so
+        # Viterbi skips them without changing the result
+        'beam': float((logT.max(axis=0) - logT.min(axis=0)).max()),
+        'known': frozenset(known_words),
         'emission_counts': emission_counts  # return raw counts for debugging
     }
 
+# Viterbi recursion over alphabet indices (compiled with Numba).
+# Fills M/BP and writes the best state sequence into out_path.
+# Transitions come from the sparse successor lists plus the per-row floor.
+def _viterbi_loops(obs, logStart, logT, logE, succ_ptr, succ_idx, succ_val,
+                   floor, beam, M, BP, out_path):
+    t = obs.shape[0]
+    V = logStart.shape[0]
+    active = np.empty(V, dtype=np.int64)
+    
+    # INITIALIZATION: time step 0
+    for s in range(V):
+        M[0, s] = logStart[s] + logE[s, obs[0]]
+        BP[0, s] = 0
+    
+    # RECURSION: time steps 1 to t-1
+    for time in range(1, t):
+        o = obs[time]
+        
+        # Only previous states within the beam of the best can win
+        prev_best = M[time-1, 0]
+        for p in range(1, V):
+            if M[time-1, p] > prev_best:
+                prev_best = M[time-1, p]
+        n_active = 0
+        for p in range(V):
+            if M[time-1, p] >= prev_best - beam:
+                active[n_active] = p
+                n_active += 1
+        
+        # Best path through a floor (unseen) transition; same for every state
+        fb = -1e18
+        fb_prev = 0
+        for i in range(n_active):
+            p = active[i]
+            v = M[time-1, p] + floor[p]
+            if v > fb:
+                fb = v
+                fb_prev = p
+        for s in range(V):
+            M[time, s] = fb
+            BP[time, s] = fb_prev
+        
+        # Explicit successors can only beat the floor
+        for i in range(n_active):
+            p = active[i]
+            for k in range(succ_ptr[p], succ_ptr[p + 1]):
+                s = succ_idx[k]
+                v = M[time-1, p] + succ_val[k]
+                if v > M[time, s]:
+                    M[time, s] = v
+                    BP[time, s] = p
+        
+        # Emission doesn't depend on the previous state, so it is
+        # added once after the max instead of inside the prev loop
+        for s in range(V):
+            M[time, s] += logE[s, o]
+    
+    # TERMINATION + BACKTRACK
+    best = 0
+    for s in range(1, V):
+        if M[t-1, s] > M[t-1, best]:
+            best = s
+    for time in range(t-1, -1, -1):
+        out_path[time] = best
+        best = BP[time, best]
+
+# Same recursion as _viterbi_loops using NumPy max-plus reductions.
+# The dense logT is used directly; the sparse lists only help the loop version.
+def _viterbi_numpy(obs, logStart, logT, logE, succ_ptr, succ_idx, succ_val,
+                   floor, beam, M, BP, out_path):
+    t = obs.shape[0]
+    M[0] = logStart + logE[:, obs[0]]
+    BP[0] = 0
+    for time in range(1, t):
+        prev = M[time-1]
+        active = np.flatnonzero(prev >= prev.max() - beam)
+        # scores[prev][state] = prev_prob + transition
+        scores = prev[active][:, None] + logT[active]
+        BP[time] = active[scores.argmax(axis=0)]
+        M[time] = scores.max(axis=0) + logE[:, obs[time]]
+    best = int(M[t-1].argmax())
+    for time in range(t-1, -1, -1):
+        out_path[time] = best
+        best = BP[time, best]
+
+if njit is not None:
+    _viterbi_core = njit(cache=True, fastmath=True)(_viterbi_loops)
+else:
+    _viterbi_core = _viterbi_numpy
+
+# Return (M, BP, path) views of the shared buffers for t steps, V states.
+def _viterbi_buffers(t, V):
+    global _M_buf, _BP_buf, _path_buf
+    if t > _M_buf.shape[0] or V != _M_buf.shape[1]:
+        rows = _M_buf.shape[0]
+        while rows < t:
+            rows *= 2
+        _M_buf = np.full((rows, V), LOG_ZERO)
+        _BP_buf = np.zeros((rows, V), dtype=np.int8)
+        _path_buf = np.zeros(rows, dtype=np.int8)
+    return _M_buf[:t], _BP_buf[:t], _path_buf[:t]
+
+# Build the HMM from a training file and make it the active model.
+# Clears cached Viterbi results from any previously loaded model.
+def load_hmm(filename):
+    global HMM
+    HMM = build_hmm_from_aspell(filename)
+    viterbi.cache_clear()
+    return HMM
+
 # Viterbi algorithm: find most likely sequence of correct letters.
-def viterbi(observations, hmm):
+# Uses the active HMM; results are cached since the model doesn't change.
+@functools.lru_cache(maxsize=8192)
+def viterbi(observations):
+    hmm = HMM
+    if hmm is None:
+        raise RuntimeError("no HMM loaded; call load_hmm() first")
     alphabet = hmm['alphabet']
-    E = hmm['E']  # emission probabilities
-    T = hmm['T']  # transition probabilities
-    start = hmm['start']  # start probabilities
     
-    # Filter to alphabet only
-    O = [c for c in observations.lower() if c in alphabet]
+    # Filter to alphabet only, as indices into the alphabet
+    O = _letter_indices(observations.lower().encode('ascii', 'ignore'))
     if len(O) == 0:
         return observations
     
+    # Words from the training data are already spelled correctly.
+    # Returned lowercase and alphabet-only, like a decoded word.
+    word = ''.join([alphabet[i] for i in O.tolist()])
+    if word in hmm['known']:
+        return word
+    
     t = len(O)  # number of time steps
+    V = len(alphabet)
     
     # M[time][state] = max log probability of being in state at time
-    # Backpointers[time][state] = best previous state
-    M = [{} for _ in range(t)]
-    Backpointers = [{} for _ in range(t)]
+    # BP[time][state] = best previous state
+    M, BP, path = _viterbi_buffers(t, V)
     
-    # INITIALIZATION: time step 0
-    # M[0][s] = P(start with s) * P(observe O[0] | state s)
-    for state in alphabet:
-        M[0][state] = safe_log(start[state]) + safe_log(E[state][O[0]])
-        Backpointers[0][state] = None
-    
-    # RECURSION: time steps 1 to t-1
-    for time in range(1, t):
-        for state in alphabet:
-            max_val = LOG_ZERO
-            best_prev = None
-            
-            # Try all possible previous states
-            for prev_state in alphabet:
-                # Calculate: prev_prob + transition + emission
-                val = (M[time-1][prev_state] + 
-                        safe_log(T[prev_state][state]) + 
-                        safe_log(E[state][O[time]]))
-                
-                if val > max_val:
-                    max_val = val
-                    best_prev = prev_state
-            
-            M[time][state] = max_val
-            Backpointers[time][state] = best_prev
-    
-    # TERMINATION: find best final state
-    best = max(M[t-1], key=M[t-1].get)
-    
-    # BACKTRACK: reconstruct path
-    path = []
-    for time in range(t-1, -1, -1):
-        path.append(best)
-        if time > 0:
-            best = Backpointers[time][best]
+    _viterbi_core(O, hmm['logStart'], hmm['logT'], hmm['logE'],
+                  hmm['succ_ptr'], hmm['succ_idx'], hmm['succ_val'], hmm['floor'],
+                  hmm['beam'], M, BP, path)
     
-    path.reverse()
-    return ''.join(path)
+    return ''.join([alphabet[i] for i in path.tolist()])
 
 # Split text into words and correct each word.
-def correct_sentence(text, hmm):
+def correct_sentence(text):
     words = text.split()
     corrected = []
     for word in words:
-        corrected_word = viterbi(word, hmm)
+        corrected_word = viterbi(word)
         corrected.append(corrected_word)
     return ' '.join(corrected)
 
 def main():
     # Build HMM from training data
     print("Building HMM from aspell.txt...")
-    hmm = build_hmm_from_aspell('aspell.txt')
+    hmm = load_hmm('aspell.txt')
     
     if hmm is None:
         return
@@ -191,13 +330,14 @@ def main():
     
     # DEBUG: Check what we learned from the training data
     emission_counts = hmm['emission_counts']
+    idx = hmm['char_to_idx']
     print("\nDEBUG: Raw emission counts (before adding boost):")
-    print("  'i' -> 'e' count:", emission_counts['i']['e'])
-    print("  'i' -> 'i' count:", emission_counts['i']['i'])
-    print("  'e' -> 'i' count:", emission_counts['e']['i'])
-    print("  'e' -> 'e' count:", emission_counts['e']['e'])
-    print("  'h' -> 't' count:", emission_counts['h']['t'])
-    print("  'e' -> 'a' count:", emission_counts['e']['a'])
+    print("  'i' -> 'e' count:", emission_counts[idx['i'], idx['e']])
+    print("  'i' -> 'i' count:", emission_counts[idx['i'], idx['i']])
+    print("  'e' -> 'i' count:", emission_counts[idx['e'], idx['i']])
+    print("  'e' -> 'e' count:", emission_counts[idx['e'], idx['e']])
+    print("  'h' -> 't' count:", emission_counts[idx['h'], idx['t']])
+    print("  'e' -> 'a' count:", emission_counts[idx['e'], idx['a']])
     
     # Show emission probabilities
     print("\nEmission probabilities for 'i' (top 5):")
@@ -241,7 +381,7 @@ def main():
             print("Goodbye!")
             break
         
-        corrected = correct_sentence(text, hmm)
+        corrected = correct_sentence(text)
         print(f"Corrected: {corrected}")
 
 if __name__ == '__main__':